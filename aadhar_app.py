@@ -1,17 +1,46 @@
 from flask import Flask, request, jsonify, render_template
-import easyocr
 import os
+import logging
 import json
 import re
-from groq import Groq
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from groq import AsyncGroq
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
-import mysql.connector  
+from ocr_client import ocr_images, start_ocr_worker
+from cache import LRUCache, content_hash
+import mysql.connector
+import mysql.connector.pooling
 
 app = Flask(__name__)
 
-# Initialize OCR
-reader = easyocr.Reader(['en'])
+# Background pool for OCR + LLM extraction jobs, keyed by job id; jobs nobody
+# polls are dropped after JOB_TTL seconds so their results don't pile up
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("EXTRACTION_WORKERS", "4")))
+JOB_TTL = int(os.getenv("JOB_TTL", "600"))
+jobs = {}
+jobs_lock = threading.Lock()
+
+def add_job(future):
+    """Register a queued job and return its id, evicting jobs older than JOB_TTL"""
+    job_id = uuid.uuid4().hex
+    now = time.monotonic()
+    with jobs_lock:
+        # Jobs are stored in submission order, so stale ones sit at the front
+        while jobs:
+            oldest_id = next(iter(jobs))
+            if now - jobs[oldest_id][1] <= JOB_TTL:
+                break
+            del jobs[oldest_id]
+        jobs[job_id] = (future, now)
+    return job_id
+
+# Extraction results keyed by a hash of the OCR text
+extraction_cache = LRUCache(int(os.getenv("EXTRACTION_CACHE_SIZE", "256")))
 
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
@@ -24,61 +53,195 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Load environment variables
 load_dotenv()
 
-# ✅ Database connection
-db = mysql.connector.connect(
+# Logging level is configurable; set LOG_LEVEL=WARNING in production
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# ✅ Database connection pool; each request borrows its own connection
+db_pool = mysql.connector.pooling.MySQLConnectionPool(
+    pool_name="aadhaarpool",
+    pool_size=int(os.getenv("DB_POOL_SIZE", "8")),
     host="localhost",
     user="root",
     password="",  
-    database="aadhaar_db"
+    database="aadhaar_db",
+    autocommit=False
 )
-cursor = db.cursor()
+
+# The pool raises PoolError at once when every connection is borrowed, so
+# bursts of requests retry briefly instead of failing with a 500
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+def get_db_connection():
+    """Borrow a pooled connection, waiting up to DB_POOL_TIMEOUT seconds for one to free up"""
+    deadline = time.monotonic() + DB_POOL_TIMEOUT
+    while True:
+        try:
+            return db_pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
 
 # Initialize Groq client
 try:
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-    print("✅ Groq API client initialized")
+    aclient = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+    logger.info("✅ Groq API client initialized")
 except Exception as e:
-    print(f"❌ Error initializing Groq client: {e}")
-    client = None
+    logger.error("❌ Error initializing Groq client: %s", e)
+    aclient = None
+
+# Run all Groq calls on one long-lived event loop so the async client's
+# connection pool is shared across request threads
+llm_loop = asyncio.new_event_loop()
+threading.Thread(target=llm_loop.run_forever, daemon=True).start()
+
+LLM_MODEL = "llama-3.3-70b-versatile"
+# Static extraction rules live in the system message so Groq can cache the prefix;
+# the user message only carries the OCR text and the keys wanted
+LLM_SYSTEM_PROMPT = """You are an expert at extracting structured data from Indian Aadhaar cards. Respond with a JSON object containing only the keys the user asks for.
+
+IMPORTANT CONTEXT about Aadhaar cards:
+- The cardholder's name appears prominently at the top
+- Father's/Husband's name appears below with prefixes like "S/O", "D/O", "W/O", "Father:", "Husband:"
+- The cardholder's name is usually in larger font and appears first
+- Father's/Husband's name is secondary information
+
+Fields:
+- name: The CARDHOLDER's name (NOT father's/husband's name)
+- aadhaar_number: 12-digit number (format: XXXX XXXX XXXX)
+- date_of_birth: Date in DD/MM/YYYY format
+- gender: Male/Female/Other
+- address: The cardholder's address
+
+EXTRACTION RULES:
+1. For NAME: Take the name that appears BEFORE any of these indicators: "S/O", "D/O", "W/O", "Father", "Husband", "Son of", "Daughter of", "Wife of"
+2. Skip any text that contains government headers like "GOVERNMENT OF INDIA", "AADHAAR", "UNIQUE IDENTIFICATION"
+3. Do NOT guess or make up any value. If the field is not clearly available, return "Not Available".
+4. For ADDRESS: Extract it only if the keyword "Address" (or variations like "Addr", "Residence") is present in the text. Otherwise, return "Not Available"."""
+
+AADHAAR_FIELDS = ['name', 'aadhaar_number', 'date_of_birth', 'gender', 'address']
+
+# Only the self-identifying 12-digit number is trusted from regex; dates and
+# gender letters also appear elsewhere on the card, so the LLM decides those
+REGEX_FIELDS = ['aadhaar_number']
+
+# Smaller prompts, one per group of fields, are sent to Groq concurrently
+AADHAAR_PROMPT_GROUPS = [
+    {"fields": ['name', 'gender'], "max_tokens": 100},
+    {"fields": ['aadhaar_number', 'date_of_birth'], "max_tokens": 100},
+    {"fields": ['address'], "max_tokens": 250}
+]
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def is_available(value):
+    """Check if an extracted value holds real data"""
+    return bool(value) and value != "Not Available"
+
+def build_extraction_prompt(fields, combined_text):
+    """Build the short per-call Groq user message for the given Aadhaar fields"""
+    return f"Text:\n{combined_text}\nReturn JSON with keys: {', '.join(fields)}."
+
+def extract_aadhaar_data_with_llm(combined_text, fields):
+    """Ask Groq for the given fields only, one concurrent prompt per field group"""
+    groups = [
+        dict(group, fields=[field for field in group["fields"] if field in fields])
+        for group in AADHAAR_PROMPT_GROUPS
+    ]
+    groups = [group for group in groups if group["fields"]]
+    
+    async def run_all():
+        return await asyncio.gather(*[
+            aclient.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": LLM_SYSTEM_PROMPT},
+                    {"role": "user", "content": build_extraction_prompt(group["fields"], combined_text)}
+                ],
+                temperature=0.1,
+                max_tokens=group["max_tokens"],
+                response_format={"type": "json_object"}
+            )
+            for group in groups
+        ], return_exceptions=True)
+    
+    responses = asyncio.run_coroutine_threadsafe(run_all(), llm_loop).result()
+    
+    extracted_data = {}
+    for group, response in zip(groups, responses):
+        if isinstance(response, Exception):
+            logger.error("❌ Groq API Error: %s", response)
+            continue
+        
+        llm_response = response.choices[0].message.content.strip()
+        logger.debug("🤖 LLM Response: %s", llm_response)
+        try:
+            group_data = json.loads(llm_response)
+        except json.JSONDecodeError as json_error:
+            logger.warning("❌ JSON parsing error: %s", json_error)
+            logger.debug("Raw response: %s", llm_response)
+            continue
+        
+        if not isinstance(group_data, dict):
+            logger.warning("❌ Unexpected LLM response type: %s", type(group_data).__name__)
+            continue
+        
+        # Each group only answers for its own fields; extra keys would overwrite another group's answer
+        extracted_data.update({field: group_data[field] for field in group["fields"] if field in group_data})
+    
+    if extracted_data:
+        logger.info("✅ Successfully parsed LLM response")
+    return extracted_data or None
+
+# Regex patterns are compiled once at import instead of on every request
+WHITESPACE_RE = re.compile(r'\s+')
+
+# One alternation finds the Aadhaar number, DOB and gender in a single scan
+AADHAAR_FIELDS_RE = re.compile(
+    r'(?P<aadhaar_number>\b\d{4}\s?\d{4}\s?\d{4}\b)'
+    r'|(?P<date_of_birth>\b\d{2}/\d{2}/\d{4}\b)'
+    r'|(?P<gender>\b(?:MALE|FEMALE|Male|Female|M|F)\b)'
+)
+
+# Common Aadhaar card headers skipped when looking for the name
+AADHAAR_HEADERS = frozenset(["GOVERNMENT", "INDIA", "AADHAAR", "UNIQUE", "IDENTIFICATION", "AUTHORITY", "OF"])
+
 def extract_aadhaar_data_locally(text):
-    """Fallback function to extract Aadhaar data using regex (if Groq fails)"""
-    print("🔧 Using local extraction as fallback...")
+    """Extract Aadhaar data using regex; name and address are a fallback for Groq"""
+    logger.info("🔧 Using local regex extraction...")
     
     # Clean the text
-    text = re.sub(r'\s+', ' ', text)  # Remove extra whitespace
-    
-    # Extract patterns
-    patterns = {
-        'aadhaar_number': r'\b\d{4}\s?\d{4}\s?\d{4}\b',
-        'date_of_birth': r'\b\d{2}/\d{2}/\d{4}\b',
-        'gender': r'\b(MALE|FEMALE|Male|Female|M|F)\b'
-    }
+    text = WHITESPACE_RE.sub(' ', text)  # Remove extra whitespace
     
     extracted = {}
     
-    # Extract using patterns
-    for field, pattern in patterns.items():
-        match = re.search(pattern, text)
-        if match:
-            extracted[field] = match.group()
+    # Extract using patterns, keeping the first match of each field
+    for match in AADHAAR_FIELDS_RE.finditer(text):
+        extracted.setdefault(match.lastgroup, match.group())
+        if len(extracted) == 3:
+            break
     
-    # Simple name extraction (improve as needed)
+    # Single pass over the words: first 2-3 non-header words as name,
+    # last few meaningful words as address (improve as needed)
     words = text.split()
-    # Remove common Aadhaar card headers
-    headers = ["GOVERNMENT", "INDIA", "AADHAAR", "UNIQUE", "IDENTIFICATION", "AUTHORITY", "OF"]
-    clean_words = [word for word in words if word.upper() not in headers and word.isalpha() and len(word) > 2]
+    address_start = len(words) - 10
+    name_words = []
+    address_words = []
+    for index, word in enumerate(words):
+        if len(name_words) < 3 and word.isalpha() and len(word) > 2 and word.upper() not in AADHAAR_HEADERS:
+            name_words.append(word)
+        # Words hold no whitespace, so an Aadhaar token is 12 leading digits
+        if index >= address_start and (len(word) < 12 or not word[:12].isdecimal()):
+            address_words.append(word)
     
-    # Take first 2-3 words as name
-    name = " ".join(clean_words[:3]) if clean_words else ""
-    
-    # Simple address extraction (last few meaningful words)
-    address_words = [word for word in words[-10:] if not re.match(r'\d{4}\s?\d{4}\s?\d{4}', word)]
-    address = " ".join(address_words) if address_words else ""
+    name = " ".join(name_words)
+    address = " ".join(address_words)
     
     return {
         "name": name,
@@ -96,11 +259,103 @@ def index():
     except Exception as e:
         return f"Error loading template: {e}", 500
 
+def extract_aadhaar_data(combined_text):
+    """Combine regex and Groq extraction; returns (data, complete), complete is False if Groq missed any field"""
+    # Regex results for deterministic fields are used as-is
+    local_data = extract_aadhaar_data_locally(combined_text)
+    extracted_data = {
+        field: local_data[field] for field in REGEX_FIELDS if is_available(local_data[field])
+    }
+    missing_fields = [field for field in AADHAAR_FIELDS if field not in extracted_data]
+    
+    # Only the fields regex could not settle are sent to Groq
+    complete = True
+    if missing_fields and aclient:
+        try:
+            logger.info("🤖 Using Groq LLM for missing fields: %s", missing_fields)
+            llm_data = extract_aadhaar_data_with_llm(combined_text, missing_fields) or {}
+            extracted_data.update({field: llm_data[field] for field in missing_fields if field in llm_data})
+            complete = all(field in llm_data for field in missing_fields)
+        except Exception as groq_error:
+            logger.error("❌ Groq API Error: %s", groq_error)
+            complete = False
+    
+    # Fall back to the local heuristics for anything still missing
+    extracted_data = {field: extracted_data.get(field, local_data[field]) for field in AADHAAR_FIELDS}
+    return extracted_data, complete
+
+def save_aadhaar_records(records):
+    """Insert extracted Aadhaar records with one batched statement and a single commit"""
+    sql = """INSERT INTO aadhaar_details (name, aadhaar_number, date_of_birth, gender, address) 
+             VALUES (%s, %s, %s, %s, %s)"""
+    values = [tuple(record.get(field, "") for field in AADHAAR_FIELDS) for record in records]
+    
+    conn = get_db_connection()
+    # A plain cursor rewrites executemany into one multi-row INSERT
+    cur = conn.cursor()
+    try:
+        cur.executemany(sql, values)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+def process_aadhaar_images(images, filenames):
+    """Run OCR and data extraction for uploaded Aadhaar images; returns (payload, status)"""
+    try:
+        combined_text = ""
+        
+        # Extract text from all images using EasyOCR
+        if images:
+            try:
+                texts = ocr_images(images)
+                for filename, text in zip(filenames, texts):
+                    logger.debug("📄 Extracted text from %s: %s...", filename, text[:100])
+                combined_text = " ".join(texts)
+            except Exception as ocr_error:
+                # An unreachable or failing OCR worker is a server fault, not an unreadable upload
+                logger.error("❌ OCR Error: %s", ocr_error)
+                return {"error": "OCR service unavailable, please try again"}, 503
+             
+        if not combined_text.strip():
+            return {"error": "No text could be extracted from images"}, 400
+        
+        logger.debug("🔤 Combined text length: %s characters", len(combined_text))
+        
+        # Identical text (e.g. a re-uploaded document) reuses the previous extraction
+        text_key = content_hash(combined_text)
+        extracted_data = extraction_cache.get(text_key)
+        if extracted_data is not None:
+            logger.info("♻️ Reusing cached extraction")
+            extracted_data = dict(extracted_data)
+        else:
+            extracted_data, complete = extract_aadhaar_data(combined_text)
+            # Results after a Groq failure are not cached so a retry can do better
+            if complete:
+                extraction_cache.put(text_key, dict(extracted_data))
+        
+        # ✅ Insert into Database
+        try:
+            save_aadhaar_records([extracted_data])
+            logger.info("✅ Data saved in database")
+        except Exception as db_error:
+            logger.error("❌ Database Error: %s", db_error)
+        
+        logger.debug("✅ Final extracted data: %s", extracted_data)
+        return extracted_data, 200
+        
+    except Exception as e:
+        logger.error("❌ General Error: %s", e)
+        return {"error": f"Server error: {str(e)}"}, 500
+
 @app.route('/extract_aadhaar', methods=['POST'])
 def extract_aadhaar():
-    """Extract Aadhaar details from uploaded images"""
+    """Queue Aadhaar extraction for uploaded images"""
     try:
-        print("📤 Received request to extract Aadhaar data")
+        logger.info("📤 Received request to extract Aadhaar data")
         
         # Check if files were uploaded
         if 'aadhaar_images' not in request.files:
@@ -110,169 +365,72 @@ def extract_aadhaar():
         if not files or all(file.filename == '' for file in files):
             return jsonify({"error": "No images selected"}), 400
         
-        combined_text = ""
-        processed_files = []
+        images = []
+        filenames = []
         
-        # Process each uploaded image
+        # Read each uploaded image once; the OCR worker decodes them
         for image in files:
             if image and allowed_file(image.filename):
                 # Secure filename
                 filename = secure_filename(image.filename)
-                image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                
-                # Save image
-                image.save(image_path)
-                processed_files.append(image_path)
+                images.append(image.stream.read())
+                filenames.append(filename)
                 
-                print(f"📸 Processing image: {filename}")
-                
-                # Extract text using EasyOCR
-                try:
-                    results = reader.readtext(image_path)
-                    text = " ".join([detection[1] for detection in results])
-                    combined_text += " " + text
-                    print(f"📄 Extracted text: {text[:100]}...")
-                except Exception as ocr_error:
-                    print(f"❌ OCR Error for {filename}: {ocr_error}")
-                    continue
-             
-        if not combined_text.strip():
-            return jsonify({"error": "No text could be extracted from images"}), 400
-        
-        print(f"🔤 Combined text length: {len(combined_text)} characters")
+                logger.info("📸 Processing image: %s", filename)
         
-        # Try to use Groq LLM for extraction
-        extracted_data = None
-        
-        if client:
-            try:
-                print("🤖 Using Groq LLM for data extraction...")
-                
-                prompt = f"""
-You are an expert at extracting information from Indian Aadhaar cards.
-
-IMPORTANT CONTEXT about Aadhaar cards:
-- The cardholder's name appears prominently at the top
-- Father's/Husband's name appears below with prefixes like "S/O", "D/O", "W/O", "Father:", "Husband:"
-- The cardholder's name is usually in larger font and appears first
-- Father's/Husband's name is secondary information
-
-Text from Aadhaar card: {combined_text}
-
-Extract the following information and return ONLY valid JSON:
-
-Required fields:
-- name: The CARDHOLDER's name (NOT father's/husband's name). If not present, return "Not Available".
-- aadhaar_number: 12-digit number (format: XXXX XXXX XXXX). If not present, return "Not Available".
-- date_of_birth: Date in DD/MM/YYYY format. If not present, return "Not Available".
-- gender: Male/Female/Other. If not present, return "Not Available".
-
-EXTRACTION RULES:
-1. For NAME: Take the name that appears BEFORE any of these indicators: "S/O", "D/O", "W/O", "Father", "Husband", "Son of", "Daughter of", "Wife of"
-2. Skip any text that contains government headers like "GOVERNMENT OF INDIA", "AADHAAR", "UNIQUE IDENTIFICATION"
-3. Do NOT guess or make up any value. If the field is not clearly available, return "Not Available".
-4. For ADDRESS: Extract it only if the keyword "Address" (or variations like "Addr", "Residence") is present in the text. Otherwise, return "Not Available".
-5. Return only valid JSON in this format:
-{{
-  "name": "...",
-  "aadhaar_number": "...",
-  "date_of_birth": "...",
-  "gender": "...",
-  "address": "..."
-}}
-"""
-                
-                response = client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "You are an expert at extracting structured data from Indian Aadhaar cards. Always return valid JSON only."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.1,
-                    max_tokens=500
-                )
-                
-                # Get the response content
-                llm_response = response.choices[0].message.content.strip()
-                print(f"🤖 LLM Response: {llm_response}")
-                
-                # Try to parse JSON from LLM response
-                try:
-                    # Clean the response (remove any markdown formatting)
-                    if '```json' in llm_response:
-                        llm_response = llm_response.split('```json')[1].split('```')[0].strip()
-                    elif '```' in llm_response:
-                        llm_response = llm_response.split('```')[1].strip()
-                    
-                    extracted_data = json.loads(llm_response)
-                    print("✅ Successfully parsed LLM response")
-                    
-                except json.JSONDecodeError as json_error:
-                    print(f"❌ JSON parsing error: {json_error}")
-                    print(f"Raw response: {llm_response}")
-                    extracted_data = None
-                    
-            except Exception as groq_error:
-                print(f"❌ Groq API Error: {groq_error}")
-                extracted_data = None
-        
-        # Fallback to local extraction if Groq fails
-        if not extracted_data:
-            print("🔄 Falling back to local regex extraction...")
-            extracted_data = extract_aadhaar_data_locally(combined_text)
-        
-        # ✅ Insert into Database
-        try:
-            sql = """INSERT INTO aadhaar_details (name, aadhaar_number, date_of_birth, gender, address) 
-                     VALUES (%s, %s, %s, %s, %s)"""
-            values = (
-                extracted_data.get("name", ""),
-                extracted_data.get("aadhaar_number", ""),
-                extracted_data.get("date_of_birth", ""),
-                extracted_data.get("gender", ""),
-                extracted_data.get("address", "")
-            )
-            cursor.execute(sql, values)
-            db.commit()
-            print("✅ Data saved in database")
-        except Exception as db_error:
-            print(f"❌ Database Error: {db_error}")
-        
-        # Clean up uploaded files (optional)
-        for file_path in processed_files:
-            try:
-                os.remove(file_path)
-            except:
-                pass
+        if not images:
+            return jsonify({"error": "No text could be extracted from images"}), 400
         
-        print(f"✅ Final extracted data: {extracted_data}")
-        return jsonify(extracted_data)
+        # OCR and LLM extraction run off the request thread; clients poll /jobs/<job_id>
+        job_id = add_job(executor.submit(process_aadhaar_images, images, filenames))
+        logger.info("🧵 Queued extraction job %s", job_id)
+        return jsonify({"job_id": job_id}), 202
         
     except Exception as e:
-        print(f"❌ General Error: {e}")
+        logger.error("❌ General Error: %s", e)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return the result of a queued extraction job, or 202 while it is still running"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    future = job[0]
+    if not future.done():
+        return jsonify({"job_id": job_id, "status": "pending"}), 202
+    
+    with jobs_lock:
+        jobs.pop(job_id, None)
+    payload, status = future.result()
+    return jsonify(payload), status
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
-        "groq_available": client is not None,
+        "groq_available": aclient is not None,
         "upload_folder": os.path.exists(UPLOAD_FOLDER)
     })
 
 if __name__ == '__main__':
-    print("🚀 Starting Aadhaar Form Automation Server...")
-    print(f"📁 Upload folder: {UPLOAD_FOLDER}")
-    print(f"🤖 Groq API: {'Available' if client else 'Not available'}")
+    logger.info("🚀 Starting Aadhaar Form Automation Server...")
+    logger.info("📁 Upload folder: %s", UPLOAD_FOLDER)
+    logger.info("🤖 Groq API: %s", 'Available' if aclient else 'Not available')
     
     # Create templates folder if it doesn't exist
     templates_dir = os.path.join(app.root_path, 'templates')
     if not os.path.exists(templates_dir):
         os.makedirs(templates_dir)
-        print(f"📂 Created templates directory: {templates_dir}")
+        logger.info("📂 Created templates directory: %s", templates_dir)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Production runs under gunicorn (gunicorn -c gunicorn.conf.py aadhar_app:app);
+    # the Werkzeug dev server is only used when asked for
+    if os.getenv("USE_DEV_SERVER"):
+        # The OCR model lives in a separate worker process shared by all web workers
+        start_ocr_worker()
+        app.run(debug=True, host='0.0.0.0', port=5000)
+    else:
+        logger.warning("⚠️ Set USE_DEV_SERVER=1 for the dev server, or run: gunicorn -c gunicorn.conf.py aadhar_app:app")
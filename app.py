@@ -1,17 +1,47 @@
 from flask import Flask, request, jsonify, render_template
-import easyocr
 import os
+import logging
 import json
 import re
-from groq import Groq
+import ahocorasick
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from groq import AsyncGroq
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
+from ocr_client import ocr_images, start_ocr_worker
+from cache import LRUCache, content_hash
 import mysql.connector
+import mysql.connector.pooling
 
 app = Flask(__name__)
 
-# Initialize OCR
-reader = easyocr.Reader(['en'])
+# Background pool for OCR + LLM extraction jobs, keyed by job id; jobs nobody
+# polls are dropped after JOB_TTL seconds so their results don't pile up
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("EXTRACTION_WORKERS", "4")))
+JOB_TTL = int(os.getenv("JOB_TTL", "600"))
+jobs = {}
+jobs_lock = threading.Lock()
+
+def add_job(future):
+    """Register a queued job and return its id, evicting jobs older than JOB_TTL"""
+    job_id = uuid.uuid4().hex
+    now = time.monotonic()
+    with jobs_lock:
+        # Jobs are stored in submission order, so stale ones sit at the front
+        while jobs:
+            oldest_id = next(iter(jobs))
+            if now - jobs[oldest_id][1] <= JOB_TTL:
+                break
+            del jobs[oldest_id]
+        jobs[job_id] = (future, now)
+    return job_id
+
+# Extraction results keyed by a hash of the OCR text
+extraction_cache = LRUCache(int(os.getenv("EXTRACTION_CACHE_SIZE", "256")))
 
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'pdf'}
@@ -24,59 +54,206 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Load environment variables
 load_dotenv()
 
-# Database connection with error handling
-try:
-    db = mysql.connector.connect(
-    host=os.getenv("SQL_SERVER"),   # e.g., "mydb.mysql.database.azure.com"
-    user=os.getenv("SQL_USER"),     
-    password=os.getenv("SQL_PASSWORD"),
-    database=os.getenv("SQL_DB")
+# Logging level is configurable; set LOG_LEVEL=WARNING in production
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
 )
-    cursor = db.cursor()
-    print("✅ Database connected successfully")
+logger = logging.getLogger(__name__)
+
+# Database connection pool with error handling; each request borrows its own connection
+try:
+    db_pool = mysql.connector.pooling.MySQLConnectionPool(
+        pool_name="bankpool",
+        pool_size=int(os.getenv("DB_POOL_SIZE", "8")),
+        host=os.getenv("SQL_SERVER"),   # e.g., "mydb.mysql.database.azure.com"
+        user=os.getenv("SQL_USER"),
+        password=os.getenv("SQL_PASSWORD"),
+        database=os.getenv("SQL_DB"),
+        autocommit=False
+    )
+    logger.info("✅ Database connected successfully")
     
     # Create table if not exists
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS bank_details (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        bank_name VARCHAR(100),
-        branch_name VARCHAR(100),
-        ifsc_code VARCHAR(20),
-        name VARCHAR(100),
-        pan_no VARCHAR(20),
-        cif VARCHAR(50),
-        phone_number VARCHAR(15),
-        account VARCHAR(50),
-        nominee VARCHAR(100),
-        address TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    print("✅ Database table ready")
+    conn = db_pool.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS bank_details (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            bank_name VARCHAR(100),
+            branch_name VARCHAR(100),
+            ifsc_code VARCHAR(20),
+            name VARCHAR(100),
+            pan_no VARCHAR(20),
+            cif VARCHAR(50),
+            phone_number VARCHAR(15),
+            account VARCHAR(50),
+            nominee VARCHAR(100),
+            address TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    logger.info("✅ Database table ready")
     
 except mysql.connector.Error as err:
-    print(f"❌ Database Error: {err}")
-    db = None
-    cursor = None
+    logger.error("❌ Database Error: %s", err)
+    db_pool = None
+
+# The pool raises PoolError at once when every connection is borrowed, so
+# bursts of requests retry briefly instead of failing with a 500
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+def get_db_connection():
+    """Borrow a pooled connection, waiting up to DB_POOL_TIMEOUT seconds for one to free up"""
+    deadline = time.monotonic() + DB_POOL_TIMEOUT
+    while True:
+        try:
+            return db_pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
 
 # Initialize Groq client
 try:
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-    print("✅ Groq API client initialized")
+    aclient = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+    logger.info("✅ Groq API client initialized")
 except Exception as e:
-    print(f"❌ Error initializing Groq client: {e}")
-    client = None
+    logger.error("❌ Error initializing Groq client: %s", e)
+    aclient = None
+
+# Run all Groq calls on one long-lived event loop so the async client's
+# connection pool is shared across request threads
+llm_loop = asyncio.new_event_loop()
+threading.Thread(target=llm_loop.run_forever, daemon=True).start()
+
+# Static extraction rules live in the system message so Groq can cache the prefix;
+# the user message only carries the OCR text and the keys wanted
+LLM_SYSTEM_PROMPT = """You are an expert at extracting structured data from Indian bank documents (passbooks, statements, account opening forms). Respond with a JSON object containing only the keys the user asks for.
+
+Fields:
+- bank_name: Name of the bank (e.g., "State Bank of India", "HDFC Bank")
+- branch_name: Branch name or location
+- ifsc_code: 11-character IFSC code (format: ABCD0123456)
+- name: Account holder's name (NOT bank staff names or branch names)
+- pan_no: PAN number (format: ABCDE1234F)
+- cif: Customer ID/CIF number
+- phone_number: Mobile/phone number (10 digits)
+- account: Bank account number
+- nominee: Nominee name if mentioned
+- address: Customer's address with full address
+
+EXTRACTION RULES:
+1. Bank name: Look for words like "BANK", "BANKING", "FINANCIAL SERVICES"
+2. Account holder name: Look for customer name, avoid bank employee names
+3. IFSC: Always 11 characters, starts with 4 letters, 5th character is 0
+4. Account number: Usually 9-18 digits
+5. PAN: Format ABCDE1234F (5 letters, 4 digits, 1 letter)
+6. If any field is not found, return "Not Available"."""
+
+BANK_FIELDS = ['bank_name', 'branch_name', 'ifsc_code', 'name', 'pan_no', 'cif', 'phone_number', 'account', 'nominee', 'address']
+
+# Only self-identifying formats are trusted from regex; bare digit runs (account,
+# CIF, phone) look alike, so the LLM decides those
+REGEX_FIELDS = ['ifsc_code', 'pan_no']
+
+# Smaller prompts, one per group of fields, are sent to Groq concurrently
+BANK_PROMPT_GROUPS = [
+    {"fields": ['bank_name', 'branch_name', 'name', 'nominee'], "max_tokens": 150},
+    {"fields": ['address'], "max_tokens": 250},
+    {"fields": ['ifsc_code', 'pan_no', 'cif', 'phone_number', 'account'], "max_tokens": 150}
+]
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def is_available(value):
+    """Check if an extracted value holds real data"""
+    return bool(value) and value != "Not Available"
+
+# Regex patterns are compiled once at import instead of on every request
+NON_ALPHA_RE = re.compile(r'[^A-Za-z\s]')
+NON_ALPHA_AMP_RE = re.compile(r'[^A-Za-z\s&]')
+ADDRESS_LABEL_RE = re.compile(r'ADDRESS[:\s]*', re.IGNORECASE)
+NOMINEE_LABEL_RE = re.compile(r'NOMINEE[:\s]*', re.IGNORECASE)
+
+# Enhanced patterns for bank documents, tried in order per field
+BANK_PATTERNS = {
+    'ifsc_code': [
+        re.compile(r'\b[A-Z]{4}0[A-Z0-9]{6}\b', re.IGNORECASE),  # Standard IFSC format
+        re.compile(r'IFSC[:\s]*([A-Z]{4}0[A-Z0-9]{6})', re.IGNORECASE),
+        re.compile(r'IFS[:\s]*([A-Z]{4}0[A-Z0-9]{6})', re.IGNORECASE)
+    ],
+    'account_number': [
+        re.compile(r'\b\d{9,18}\b', re.IGNORECASE),  # Account numbers are typically 9-18 digits
+        re.compile(r'A/C[:\s]*(\d{9,18})', re.IGNORECASE),
+        re.compile(r'ACCOUNT[:\s]*(\d{9,18})', re.IGNORECASE),
+        re.compile(r'ACC[:\s]*(\d{9,18})', re.IGNORECASE)
+    ],
+    'pan_number': [
+        re.compile(r'\b[A-Z]{5}\d{4}[A-Z]\b', re.IGNORECASE),  # PAN format
+        re.compile(r'PAN[:\s]*([A-Z]{5}\d{4}[A-Z])', re.IGNORECASE)
+    ],
+    'phone_number': [
+        re.compile(r'\b[6-9]\d{9}\b', re.IGNORECASE),  # Indian mobile numbers
+        re.compile(r'MOBILE[:\s]*([6-9]\d{9})', re.IGNORECASE),
+        re.compile(r'PHONE[:\s]*([6-9]\d{9})', re.IGNORECASE),
+        re.compile(r'MOB[:\s]*([6-9]\d{9})', re.IGNORECASE)
+    ],
+    'cif': [
+        re.compile(r'CIF[:\s]*(\d{8,12})', re.IGNORECASE),
+        re.compile(r'CUSTOMER[:\s]*ID[:\s]*(\d{8,12})', re.IGNORECASE),
+        re.compile(r'ID[:\s]*(\d{8,12})', re.IGNORECASE)
+    ]
+}
+
+# Single-character OCR artifacts replaced with spaces
+OCR_ARTIFACT_TABLE = str.maketrans({'|': ' ', '_': ' '})
+
+# Keyword sets used to classify lines in the local extractor
+BANK_KEYWORDS = frozenset(['BANK', 'BANKING', 'FINANCIAL', 'COOPERATIVE', 'CREDIT', 'UNION'])
+SKIP_KEYWORDS = frozenset(['BANK', 'STATEMENT', 'ACCOUNT', 'PASSBOOK', 'BRANCH', 'ADDRESS', 'PHONE', 'MOBILE', 'IFSC', 'CODE'])
+BRANCH_KEYWORDS = frozenset(['BRANCH', 'BR.', 'OFFICE'])
+ADDRESS_KEYWORDS = frozenset(['ADDRESS', 'ADDR', 'RESIDENCE', 'PIN', 'PINCODE'])
+NOMINEE_KEYWORDS = frozenset(['NOMINEE', 'NOMINY', 'BENEFICIARY'])
+
+def build_keyword_automaton(keyword_sets):
+    """Build an Aho-Corasick automaton mapping each keyword to the categories it belongs to"""
+    categories = {}
+    for category, keywords in keyword_sets.items():
+        for keyword in keywords:
+            categories.setdefault(keyword, set()).add(category)
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, keyword_categories in categories.items():
+        automaton.add_word(keyword, frozenset(keyword_categories))
+    automaton.make_automaton()
+    return automaton
+
+def matched_categories(automaton, text):
+    """Return the categories of every keyword found in text, in a single scan"""
+    return {category for _, categories in automaton.iter(text) for category in categories}
+
+# One automaton answers "which keyword sets occur in this line" in a single pass
+LINE_KEYWORD_AUTOMATON = build_keyword_automaton({
+    'bank': BANK_KEYWORDS,
+    'branch': BRANCH_KEYWORDS,
+    'address': ADDRESS_KEYWORDS,
+    'nominee': NOMINEE_KEYWORDS
+})
+SKIP_KEYWORD_AUTOMATON = build_keyword_automaton({'skip': SKIP_KEYWORDS})
+
 def preprocess_bank_text(text):
     """Preprocess bank document text for better extraction"""
     # Clean up common OCR artifacts
-    text = re.sub(r'\s+', ' ', text)  # Multiple spaces to single space
-    text = re.sub(r'[|]+', ' ', text)  # Remove pipe characters
-    text = re.sub(r'_+', ' ', text)  # Remove underscores
+    text = text.translate(OCR_ARTIFACT_TABLE)  # Remove pipe characters and underscores
+    text = " ".join(text.split())  # Multiple spaces to single space
     
     # Split into lines for analysis
     lines = []
@@ -96,128 +273,130 @@ VECTORSTORE_PATH = os.getenv("VECTORSTORE_PATH", "chroma_store")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_NAME = os.getenv("MODEL_NAME")
 
+def build_extraction_prompt(fields, combined_text):
+    """Build the short per-call Groq user message for the given bank fields"""
+    return f"Text:\n{combined_text}\nReturn JSON with keys: {', '.join(fields)}."
+
+def extract_bank_data_with_llm(combined_text, fields):
+    """Ask Groq for the given fields only, one concurrent prompt per field group"""
+    groups = [
+        dict(group, fields=[field for field in group["fields"] if field in fields])
+        for group in BANK_PROMPT_GROUPS
+    ]
+    groups = [group for group in groups if group["fields"]]
+    
+    async def run_all():
+        return await asyncio.gather(*[
+            aclient.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": LLM_SYSTEM_PROMPT},
+                    {"role": "user", "content": build_extraction_prompt(group["fields"], combined_text)}
+                ],
+                temperature=0.1,
+                max_tokens=group["max_tokens"],
+                response_format={"type": "json_object"}
+            )
+            for group in groups
+        ], return_exceptions=True)
+    
+    responses = asyncio.run_coroutine_threadsafe(run_all(), llm_loop).result()
+    
+    extracted_data = {}
+    for group, response in zip(groups, responses):
+        if isinstance(response, Exception):
+            logger.error("❌ Groq API Error: %s", response)
+            continue
+        
+        llm_response = response.choices[0].message.content.strip()
+        logger.debug("🤖 LLM Response: %s", llm_response)
+        try:
+            group_data = json.loads(llm_response)
+        except json.JSONDecodeError as json_error:
+            logger.warning("❌ JSON parsing error: %s", json_error)
+            logger.debug("Raw response: %s", llm_response)
+            continue
+        
+        if not isinstance(group_data, dict):
+            logger.warning("❌ Unexpected LLM response type: %s", type(group_data).__name__)
+            continue
+        
+        # Each group only answers for its own fields; extra keys would overwrite another group's answer
+        extracted_data.update({field: group_data[field] for field in group["fields"] if field in group_data})
+    
+    if extracted_data:
+        logger.info("✅ Successfully parsed LLM response")
+    return extracted_data or None
+
 def extract_bank_data_locally(text):
     """Enhanced local extraction for bank documents"""
-    print("🔧 Using enhanced local extraction for bank data...")
+    logger.info("🔧 Using enhanced local extraction for bank data...")
     
     lines, clean_text = preprocess_bank_text(text)
     
-    print(f"📄 Processing {len(lines)} text lines...")
-    
-    # Enhanced patterns for bank documents
-    patterns = {
-        'ifsc_code': [
-            r'\b[A-Z]{4}0[A-Z0-9]{6}\b',  # Standard IFSC format
-            r'IFSC[:\s]*([A-Z]{4}0[A-Z0-9]{6})',
-            r'IFS[:\s]*([A-Z]{4}0[A-Z0-9]{6})'
-        ],
-        'account_number': [
-            r'\b\d{9,18}\b',  # Account numbers are typically 9-18 digits
-            r'A/C[:\s]*(\d{9,18})',
-            r'ACCOUNT[:\s]*(\d{9,18})',
-            r'ACC[:\s]*(\d{9,18})'
-        ],
-        'pan_number': [
-            r'\b[A-Z]{5}\d{4}[A-Z]\b',  # PAN format
-            r'PAN[:\s]*([A-Z]{5}\d{4}[A-Z])'
-        ],
-        'phone_number': [
-            r'\b[6-9]\d{9}\b',  # Indian mobile numbers
-            r'MOBILE[:\s]*([6-9]\d{9})',
-            r'PHONE[:\s]*([6-9]\d{9})',
-            r'MOB[:\s]*([6-9]\d{9})'
-        ],
-        'cif': [
-            r'CIF[:\s]*(\d{8,12})',
-            r'CUSTOMER[:\s]*ID[:\s]*(\d{8,12})',
-            r'ID[:\s]*(\d{8,12})'
-        ]
-    }
+    logger.debug("📄 Processing %s text lines...", len(lines))
     
     extracted = {}
     
-    # Extract using multiple patterns
-    for field, pattern_list in patterns.items():
+    # Extract using multiple patterns on the already cleaned text
+    for field, pattern_list in BANK_PATTERNS.items():
         for pattern in pattern_list:
-            matches = re.findall(pattern, clean_text, re.IGNORECASE)
-            if matches:
-                # Take the first valid match
-                match = matches[0] if isinstance(matches[0], str) else matches[0]
-                extracted[field] = match
+            match = pattern.search(clean_text)
+            if match:
+                # Take the first valid match (the captured value for labelled patterns)
+                extracted[field] = match.group(1) if pattern.groups else match.group()
                 break
     
-    # Extract bank name (usually appears early in the document)
-    bank_keywords = ['BANK', 'BANKING', 'FINANCIAL', 'COOPERATIVE', 'CREDIT', 'UNION']
     bank_name = ""
+    customer_name = ""
+    branch_name = ""
+    address_lines = []
+    nominee = ""
     
-    for line in lines[:10]:  # Check first 10 lines
-        line_upper = line.upper()
-        if any(keyword in line_upper for keyword in bank_keywords):
+    # Upper-cased and letters-only forms of each line are computed once and shared by every field
+    upper_lines = [line.upper() for line in lines]
+    alpha_words = [NON_ALPHA_RE.sub(' ', line).split() for line in lines]
+    
+    # Single sweep over the lines, filling each field as its candidate appears
+    for index, (line, line_upper, words) in enumerate(zip(lines, upper_lines, alpha_words)):
+        line_alpha = " ".join(words)
+        alpha_upper = line_alpha.upper()
+        categories = matched_categories(LINE_KEYWORD_AUTOMATON, line_upper)
+        
+        # Bank name (usually appears early in the document)
+        if not bank_name and index < 10 and 'bank' in categories:
             # Clean up the bank name
-            bank_line = re.sub(r'[^A-Za-z\s&]', ' ', line)
-            bank_line = re.sub(r'\s+', ' ', bank_line).strip()
+            bank_line = " ".join(NON_ALPHA_AMP_RE.sub(' ', line).split())
             if len(bank_line) > 5:
                 bank_name = bank_line
-                break
-    
-    # Extract customer name (avoid bank names and headers)
-    customer_name = ""
-    skip_keywords = ['BANK', 'STATEMENT', 'ACCOUNT', 'PASSBOOK', 'BRANCH', 'ADDRESS', 'PHONE', 'MOBILE', 'IFSC', 'CODE']
-    
-    for line in lines:
-        line_clean = re.sub(r'[^A-Za-z\s]', ' ', line)
-        line_clean = re.sub(r'\s+', ' ', line_clean).strip()
         
-        # Skip if contains skip keywords or numbers
-        if (line_clean and 
-            len(line_clean.split()) >= 2 and 
-            len(line_clean.split()) <= 4 and
-            not any(keyword in line_clean.upper() for keyword in skip_keywords) and
-            not re.search(r'\d', line_clean) and
-            len(line_clean) > 5):
-            
-            customer_name = line_clean
-            break
-    
-    # Extract branch name
-    branch_name = ""
-    branch_keywords = ['BRANCH', 'BR.', 'OFFICE']
-    for line in lines:
-        line_upper = line.upper()
-        if any(keyword in line_upper for keyword in branch_keywords):
-            branch_line = re.sub(r'[^A-Za-z\s]', ' ', line)
-            branch_line = re.sub(r'\s+', ' ', branch_line).strip()
-            if 'BRANCH' in branch_line.upper() and len(branch_line) > 10:
-                branch_name = branch_line
-                break
-    
-    # Extract address (lines containing address keywords)
-    address_lines = []
-    address_keywords = ['ADDRESS', 'ADDR', 'RESIDENCE', 'PIN', 'PINCODE']
-    
-    for line in lines:
-        line_upper = line.upper()
-        if any(keyword in line_upper for keyword in address_keywords):
-            # Clean address line
-            addr_line = re.sub(r'ADDRESS[:\s]*', '', line, flags=re.IGNORECASE)
-            addr_line = addr_line.strip()
+        # Customer name (avoid bank names and headers)
+        if not customer_name:
+            if (2 <= len(words) <= 4 and
+                len(line_alpha) > 5 and
+                not matched_categories(SKIP_KEYWORD_AUTOMATON, alpha_upper)):
+                customer_name = line_alpha
+        
+        # Branch name
+        if (not branch_name and
+            'branch' in categories and
+            'BRANCH' in alpha_upper and len(line_alpha) > 10):
+            branch_name = line_alpha
+        
+        # Address (every line containing address keywords)
+        if 'address' in categories:
+            addr_line = ADDRESS_LABEL_RE.sub('', line).strip()
             if addr_line and len(addr_line) > 5:
                 address_lines.append(addr_line)
-    
-    address = " ".join(address_lines) if address_lines else ""
-    
-    # Extract nominee (if present)
-    nominee = ""
-    nominee_keywords = ['NOMINEE', 'NOMINY', 'BENEFICIARY']
-    for line in lines:
-        line_upper = line.upper()   
-        if any(keyword in line_upper for keyword in nominee_keywords):
-            nominee_line = re.sub(r'NOMINEE[:\s]*', '', line, flags=re.IGNORECASE)
-            nominee_line = re.sub(r'[^A-Za-z\s]', ' ', nominee_line)
-            nominee_line = re.sub(r'\s+', ' ', nominee_line).strip()
+        
+        # Nominee (if present)
+        if not nominee and 'nominee' in categories:
+            nominee_line = NOMINEE_LABEL_RE.sub('', line)
+            nominee_line = " ".join(NON_ALPHA_RE.sub(' ', nominee_line).split())
             if nominee_line and len(nominee_line) > 3:
                 nominee = nominee_line
-                break
+    
+    address = " ".join(address_lines) if address_lines else ""
     
     result = {
         "bank_name": bank_name or "Not Available",
@@ -232,7 +411,7 @@ def extract_bank_data_locally(text):
         "address": address or "Not Available"
     }
     
-    print(f"📋 Local extraction result: {result}")
+    logger.debug("📋 Local extraction result: %s", result)
     return result
 
 @app.route('/')
@@ -243,140 +422,84 @@ def index():
     except Exception as e:
         return f"Error loading template: {e}", 500
 
-@app.route('/extract_bank', methods=['POST'])
-def extract_bank():
-    """Extract bank details from uploaded documents"""
+def extract_bank_data(combined_text):
+    """Combine regex and Groq extraction; returns (data, complete), complete is False if Groq missed any field"""
+    # Regex results for deterministic fields are used as-is
+    local_data = extract_bank_data_locally(combined_text)
+    extracted_data = {
+        field: local_data[field] for field in REGEX_FIELDS if is_available(local_data[field])
+    }
+    missing_fields = [field for field in BANK_FIELDS if field not in extracted_data]
+    
+    # Only the fields regex could not settle are sent to Groq
+    complete = True
+    if missing_fields and aclient:
+        try:
+            logger.info("🤖 Using Groq LLM for missing bank fields: %s", missing_fields)
+            llm_data = extract_bank_data_with_llm(combined_text, missing_fields) or {}
+            extracted_data.update({field: llm_data[field] for field in missing_fields if field in llm_data})
+            complete = all(field in llm_data for field in missing_fields)
+        except Exception as groq_error:
+            logger.error("❌ Groq API Error: %s", groq_error)
+            complete = False
+    
+    # Fall back to the local heuristics for anything still missing
+    extracted_data = {field: extracted_data.get(field, local_data[field]) for field in BANK_FIELDS}
+    return extracted_data, complete
+
+def save_bank_records(records):
+    """Insert extracted bank records with one batched statement and a single commit"""
+    sql = """INSERT INTO bank_details 
+    (bank_name, branch_name, ifsc_code, name, pan_no, cif, phone_number, account, nominee, address) 
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+    values = [tuple(record.get(field, "Not Available") for field in BANK_FIELDS) for record in records]
+    
+    conn = get_db_connection()
+    # A plain cursor rewrites executemany into one multi-row INSERT
+    cur = conn.cursor()
+    try:
+        cur.executemany(sql, values)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+def process_bank_images(images, filenames):
+    """Run OCR and data extraction for uploaded bank images; returns (payload, status)"""
     try:
-        print("📤 Received request to extract bank data")
-        
-        # Check if files were uploaded
-        if 'bank_images' not in request.files:
-            return jsonify({"error": "No images uploaded"}), 400
-        
-        files = request.files.getlist('bank_images')
-        if not files or all(file.filename == '' for file in files):
-            return jsonify({"error": "No images selected"}), 400
-        
         combined_text = ""
-        processed_files = []
         
-        # Process each uploaded image
-        for image in files:
-            if image and allowed_file(image.filename):
-                # Secure filename
-                filename = secure_filename(image.filename)
-                image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                
-                # Save image
-                image.save(image_path)
-                processed_files.append(image_path)
-                
-                print(f"📸 Processing image: {filename}")
-                
-                # Extract text using EasyOCR
-                try:
-                    results = reader.readtext(image_path)
-                    text = " ".join([detection[1] for detection in results])
-                    combined_text += " " + text
-                    print(f"📄 Extracted text: {text[:100]}...")
-                except Exception as ocr_error:
-                    print(f"❌ OCR Error for {filename}: {ocr_error}")
-                    continue
+        # Extract text from all images using EasyOCR
+        if images:
+            try:
+                texts = ocr_images(images)
+                for filename, text in zip(filenames, texts):
+                    logger.debug("📄 Extracted text from %s: %s...", filename, text[:100])
+                combined_text = " ".join(texts)
+            except Exception as ocr_error:
+                # An unreachable or failing OCR worker is a server fault, not an unreadable upload
+                logger.error("❌ OCR Error: %s", ocr_error)
+                return {"error": "OCR service unavailable, please try again"}, 503
         
         if not combined_text.strip():
-            return jsonify({"error": "No text could be extracted from images"}), 400
+            return {"error": "No text could be extracted from images"}, 400
         
-        print(f"🔤 Combined text length: {len(combined_text)} characters")
+        logger.debug("🔤 Combined text length: %s characters", len(combined_text))
         
-        # Try to use Groq LLM for extraction
-        extracted_data = None
-        
-        if client:
-            try:
-                print("🤖 Using Groq LLM for bank data extraction...")
-                
-                prompt = f"""
-You are an expert at extracting structured data from bank documents (passbooks, statements, account opening forms).
-
-Extract the following information from this bank document text and return ONLY valid JSON:
-
-Text: {combined_text}
-
-Required fields:
-- bank_name: Name of the bank (e.g., "State Bank of India", "HDFC Bank")
-- branch_name: Branch name or location
-- ifsc_code: 11-character IFSC code (format: ABCD0123456)
-- name: Account holder's name (NOT bank staff names or branch names)
-- pan_no: PAN number (format: ABCDE1234F)
-- cif: Customer ID/CIF number
-- phone_number: Mobile/phone number (10 digits)
-- account: Bank account number
-- nominee: Nominee name if mentioned
-- address: Customer's address with full address
-EXTRACTION RULES:
-1. Bank name: Look for words like "BANK", "BANKING", "FINANCIAL SERVICES"
-2. Account holder name: Look for customer name, avoid bank employee names
-3. IFSC: Always 11 characters, starts with 4 letters, 5th character is 0
-4. Account number: Usually 9-18 digits
-5. PAN: Format ABCDE1234F (5 letters, 4 digits, 1 letter)
-6. If any field is not found, return "Not Available"
-
-Return only valid JSON:
-{{
-    "bank_name": "...",
-    "branch_name": "...",
-    "ifsc_code": "...",
-    "name": "...",
-    "pan_no": "...",
-    "cif": "...",
-    "phone_number": "...",
-    "account": "...",
-    "nominee": "...",
-    "address": "..."
-}}
-"""
-                
-                response = client.chat.completions.create(
-                    model= MODEL_NAME,
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "You are an expert at extracting data from Indian bank documents. You understand bank passbooks, statements, and account forms. Always return valid JSON only."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.1,
-                    max_tokens=500
-                )
-                
-                # Get the response content
-                llm_response = response.choices[0].message.content.strip()
-                print(f"🤖 LLM Response: {llm_response}")
-                
-                # Try to parse JSON from LLM response
-                try:
-                    # Clean the response (remove any markdown formatting)
-                    if '```json' in llm_response:
-                        llm_response = llm_response.split('```json')[1].split('```')[0].strip()
-                    elif '```' in llm_response:
-                        llm_response = llm_response.split('```')[1].strip()
-                    
-                    extracted_data = json.loads(llm_response)
-                    print("✅ Successfully parsed LLM response")
-                    
-                except json.JSONDecodeError as json_error:
-                    print(f"❌ JSON parsing error: {json_error}")
-                    print(f"Raw response: {llm_response}")
-                    extracted_data = None
-                    
-            except Exception as groq_error:
-                print(f"❌ Groq API Error: {groq_error}")
-                extracted_data = None
-        
-        # Fallback to local extraction if Groq fails
-        if not extracted_data:
-            print("🔄 Falling back to local regex extraction...")
-            extracted_data = extract_bank_data_locally(combined_text)
+        # Identical text (e.g. a re-uploaded document) reuses the previous extraction
+        text_key = content_hash(combined_text)
+        extracted_data = extraction_cache.get(text_key)
+        if extracted_data is not None:
+            logger.info("♻️ Reusing cached extraction")
+            extracted_data = dict(extracted_data)
+        else:
+            extracted_data, complete = extract_bank_data(combined_text)
+            # Results after a Groq failure are not cached so a retry can do better
+            if complete:
+                extraction_cache.put(text_key, dict(extracted_data))
         
         # Validate and clean extracted data
         if extracted_data:
@@ -389,62 +512,82 @@ Return only valid JSON:
                         extracted_data[key] = "Not Available"
         
         # Save to database
-        if db and cursor and extracted_data:
+        if db_pool and extracted_data:
             try:
-                print("💾 Saving to database...")
-                sql = """INSERT INTO bank_details 
-                (bank_name, branch_name, ifsc_code, name, pan_no, cif, phone_number, account, nominee, address) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-                
-                values = (
-                    extracted_data.get("bank_name", "Not Available"),
-                    extracted_data.get("branch_name", "Not Available"),
-                    extracted_data.get("ifsc_code", "Not Available"),
-                    extracted_data.get("name", "Not Available"),
-                    extracted_data.get("pan_no", "Not Available"),
-                    extracted_data.get("cif", "Not Available"),
-                    extracted_data.get("phone_number", "Not Available"),
-                    extracted_data.get("account", "Not Available"),
-                    extracted_data.get("nominee", "Not Available"),
-                    extracted_data.get("address", "Not Available")
-                )
-                
-                cursor.execute(sql, values)
-                db.commit()
-                print("✅ Data saved to database successfully")
+                logger.info("💾 Saving to database...")
+                save_bank_records([extracted_data])
+                logger.info("✅ Data saved to database successfully")
                 
             except mysql.connector.Error as db_error:
-                print(f"❌ Database Error: {db_error}")
+                logger.error("❌ Database Error: %s", db_error)
             except Exception as e:
-                print(f"❌ General DB Error: {e}")
+                logger.error("❌ General DB Error: %s", e)
         
-        # Clean up uploaded files
-        for file_path in processed_files:
-            try:
-                os.remove(file_path)
-            except:
-                pass
+        logger.debug("✅ Final extracted data: %s", extracted_data)
+        return extracted_data, 200
+        
+    except Exception as e:
+        logger.error("❌ General Error: %s", e)
+        return {"error": f"Server error: {str(e)}"}, 500
+
+@app.route('/extract_bank', methods=['POST'])
+def extract_bank():
+    """Queue bank extraction for uploaded documents"""
+    try:
+        logger.info("📤 Received request to extract bank data")
         
-        print(f"✅ Final extracted data: {extracted_data}")
-        return jsonify(extracted_data)
+        # Check if files were uploaded
+        if 'bank_images' not in request.files:
+            return jsonify({"error": "No images uploaded"}), 400
+        
+        files = request.files.getlist('bank_images')
+        if not files or all(file.filename == '' for file in files):
+            return jsonify({"error": "No images selected"}), 400
+        
+        images = []
+        filenames = []
+        
+        # Read each uploaded image once; the OCR worker decodes them
+        for image in files:
+            if image and allowed_file(image.filename):
+                # Secure filename
+                filename = secure_filename(image.filename)
+                images.append(image.stream.read())
+                filenames.append(filename)
+                
+                logger.info("📸 Processing image: %s", filename)
+        
+        if not images:
+            return jsonify({"error": "No text could be extracted from images"}), 400
+        
+        # OCR and LLM extraction run off the request thread; clients poll /jobs/<job_id>
+        job_id = add_job(executor.submit(process_bank_images, images, filenames))
+        logger.info("🧵 Queued extraction job %s", job_id)
+        return jsonify({"job_id": job_id}), 202
         
     except Exception as e:
-        print(f"❌ General Error: {e}")
+        logger.error("❌ General Error: %s", e)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @app.route('/get_all_records', methods=['GET'])
 def get_all_records():
     """Get all records from database"""
     try:
-        if not db or not cursor:
+        if not db_pool:
             return jsonify({"error": "Database not available"}), 500
         
-        cursor.execute("SELECT * FROM bank_details ORDER BY created_at DESC")
-        records = cursor.fetchall()
-        
-        # Get column names
-        cursor.execute("DESCRIBE bank_details")
-        columns = [column[0] for column in cursor.fetchall()]
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT * FROM bank_details ORDER BY created_at DESC")
+            records = cur.fetchall()
+            
+            # Get column names
+            cur.execute("DESCRIBE bank_details")
+            columns = [column[0] for column in cur.fetchall()]
+        finally:
+            cur.close()
+            conn.close()
         
         # Convert to list of dictionaries
         result = []
@@ -458,35 +601,58 @@ def get_all_records():
         return jsonify(result)
         
     except Exception as e:
-        print(f"❌ Error fetching records: {e}")
+        logger.error("❌ Error fetching records: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/delete_record/<int:record_id>', methods=['DELETE'])
 def delete_record(record_id):
     """Delete a specific record"""
     try:
-        if not db or not cursor:
+        if not db_pool:
             return jsonify({"error": "Database not available"}), 500
         
-        cursor.execute("DELETE FROM bank_details WHERE id = %s", (record_id,))
-        db.commit()
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM bank_details WHERE id = %s", (record_id,))
+            conn.commit()
+            deleted = cur.rowcount
+        finally:
+            cur.close()
+            conn.close()
         
-        if cursor.rowcount > 0:
+        if deleted > 0:
             return jsonify({"message": "Record deleted successfully"})
         else:
             return jsonify({"error": "Record not found"}), 404
             
     except Exception as e:
-        print(f"❌ Error deleting record: {e}")
+        logger.error("❌ Error deleting record: %s", e)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return the result of a queued extraction job, or 202 while it is still running"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    future = job[0]
+    if not future.done():
+        return jsonify({"job_id": job_id, "status": "pending"}), 202
+    
+    with jobs_lock:
+        jobs.pop(job_id, None)
+    payload, status = future.result()
+    return jsonify(payload), status
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
-        "groq_available": client is not None,
-        "database_available": db is not None,
+        "groq_available": aclient is not None,
+        "database_available": db_pool is not None,
         "upload_folder": os.path.exists(UPLOAD_FOLDER)
     })
 
@@ -499,15 +665,23 @@ def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
 
 if __name__ == '__main__':
-    print("🚀 Starting Bank Form Automation Server...")
-    print(f"📁 Upload folder: {UPLOAD_FOLDER}")
-    print(f"🤖 Groq API: {'Available' if client else 'Not available'}")
-    print(f"🗄️ Database: {'Connected' if db else 'Not connected'}")
+    logger.info("🚀 Starting Bank Form Automation Server...")
+    logger.info("📁 Upload folder: %s", UPLOAD_FOLDER)
+    logger.info("🤖 Groq API: %s", 'Available' if aclient else 'Not available')
+    logger.info("🗄️ Database: %s", 'Connected' if db_pool else 'Not connected')
     
     # Create templates folder if it doesn't exist
     templates_dir = os.path.join(app.root_path, 'templates')
     if not os.path.exists(templates_dir):
         os.makedirs(templates_dir)
-        print(f"📂 Created templates directory: {templates_dir}")
-    port = int(os.environ.get("PORT", 5000))   # Azure injects PORT dynamically
-    app.run(debug=False, host='0.0.0.0', port=port)
+        logger.info("📂 Created templates directory: %s", templates_dir)
+    
+    # Production runs under gunicorn (gunicorn -c gunicorn.conf.py app:app);
+    # the Werkzeug dev server is only used when asked for
+    if os.getenv("USE_DEV_SERVER"):
+        # The OCR model lives in a separate worker process shared by all web workers
+        start_ocr_worker()
+        port = int(os.environ.get("PORT", 5000))   # Azure injects PORT dynamically
+        app.run(debug=False, host='0.0.0.0', port=port)
+    else:
+        logger.warning("⚠️ Set USE_DEV_SERVER=1 for the dev server, or run: gunicorn -c gunicorn.conf.py app:app")
@@ -0,0 +1,33 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+def content_hash(data):
+    """Return a short blake2b digest identifying the given bytes or text"""
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+class LRUCache:
+    """Thread-safe cache that keeps the most recently used entries"""
+    
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+    
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -0,0 +1,19 @@
+import os
+from ocr_client import start_ocr_worker
+
+# gevent workers multiplex many in-flight uploads and Groq calls over greenlets.
+# Everything the web process waits on (OCR worker, MySQL, Groq) must go through
+# Python sockets so gevent can switch greenlets while the call is pending
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"  # Azure injects PORT dynamically
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = 50
+timeout = 120  # OCR is slow
+
+# Extraction jobs are tracked in process memory, so /jobs/<job_id> polling
+# needs requests to land on the worker that queued the job; raise this only
+# together with a shared job store
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+def on_starting(server):
+    """Start the shared OCR worker once, from the gunicorn master"""
+    start_ocr_worker()
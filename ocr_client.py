@@ -0,0 +1,143 @@
+import os
+import sys
+import atexit
+import socket
+import hmac
+import json
+import struct
+import hashlib
+import secrets
+import logging
+import threading
+import subprocess
+from dotenv import load_dotenv
+from cache import LRUCache, content_hash
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# The OCR worker (ocr_worker.py) holds the only copy of the EasyOCR model;
+# web processes talk to it over a local HMAC-authenticated socket. Messages are
+# length-prefixed frames of JSON or raw image bytes, so nothing is ever unpickled
+# and the same code runs on plain threads and under gevent
+OCR_WORKER_ADDRESS = (
+    os.getenv("OCR_WORKER_HOST", "localhost"),
+    int(os.getenv("OCR_WORKER_PORT", "6000"))
+)
+
+# Seconds to wait for the worker to accept a connection and to answer it
+OCR_CONNECT_TIMEOUT = float(os.getenv("OCR_CONNECT_TIMEOUT", "5"))
+OCR_RESPONSE_TIMEOUT = int(os.getenv("OCR_RESPONSE_TIMEOUT", "120"))
+OCR_RESTART_DELAY = 2
+
+# Frames larger than this are refused; uploads are capped at 16MB anyway
+OCR_MAX_FRAME_SIZE = 64 * 1024 * 1024
+OCR_CHALLENGE_SIZE = 32
+
+# Re-uploads of the same image reuse its text instead of running OCR again
+ocr_cache = LRUCache(int(os.getenv("OCR_CACHE_SIZE", "256")))
+
+def ocr_worker_authkey():
+    """Return the secret shared with the OCR worker; there is deliberately no default"""
+    authkey = os.getenv("OCR_WORKER_AUTHKEY")
+    if not authkey:
+        raise RuntimeError("OCR_WORKER_AUTHKEY is not set")
+    return authkey.encode()
+
+def worker_listening():
+    """Check whether some process accepts connections on the OCR worker address"""
+    try:
+        socket.create_connection(OCR_WORKER_ADDRESS, timeout=OCR_CONNECT_TIMEOUT).close()
+        return True
+    except OSError:
+        return False
+
+def start_ocr_worker():
+    """Launch ocr_worker.py in its own process and restart it if it crashes"""
+    # Without a configured secret, generate one; the worker and forked web
+    # processes inherit it through the environment
+    os.environ.setdefault("OCR_WORKER_AUTHKEY", secrets.token_hex(32))
+    worker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ocr_worker.py')
+    stopping = threading.Event()
+    current = []
+    
+    def supervise():
+        while not stopping.is_set():
+            process = subprocess.Popen([sys.executable, worker_script])
+            current[:] = [process]
+            returncode = process.wait()
+            # The exit code is unreliable under gunicorn, whose master reaps every child,
+            # so a worker that exits while the address still answers was a duplicate
+            if stopping.is_set() or worker_listening():
+                return
+            logger.error("❌ OCR worker exited with code %s, restarting", returncode)
+            stopping.wait(OCR_RESTART_DELAY)
+    
+    def stop():
+        stopping.set()
+        for process in current:
+            process.terminate()
+    
+    atexit.register(stop)
+    threading.Thread(target=supervise, daemon=True).start()
+
+def auth_digest(authkey, challenge):
+    """Return the HMAC proving knowledge of the shared secret for a worker challenge"""
+    return hmac.new(authkey, challenge, hashlib.sha256).digest()
+
+def send_frame(sock, payload):
+    """Send one length-prefixed frame"""
+    sock.sendall(struct.pack("!I", len(payload)))
+    sock.sendall(payload)
+
+def recv_exact(sock, size):
+    """Read exactly size bytes from sock, failing if the peer closes first"""
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("OCR connection closed mid-message")
+        buffer += chunk
+    return bytes(buffer)
+
+def recv_frame(sock, max_size=OCR_MAX_FRAME_SIZE):
+    """Read one length-prefixed frame, refusing frames over max_size"""
+    (size,) = struct.unpack("!I", recv_exact(sock, 4))
+    if size > max_size:
+        raise ValueError(f"OCR frame of {size} bytes exceeds {max_size}")
+    return recv_exact(sock, size)
+
+def request_ocr(raw_images, batched):
+    """Send raw images to the OCR worker and return the text of each one"""
+    authkey = ocr_worker_authkey()
+    with socket.create_connection(OCR_WORKER_ADDRESS, timeout=OCR_CONNECT_TIMEOUT) as sock:
+        # Every later read, including the wait for OCR itself, is bounded by this timeout
+        sock.settimeout(OCR_RESPONSE_TIMEOUT)
+        send_frame(sock, auth_digest(authkey, recv_frame(sock, OCR_CHALLENGE_SIZE)))
+        send_frame(sock, json.dumps({"batched": batched, "count": len(raw_images)}).encode())
+        for raw in raw_images:
+            send_frame(sock, raw)
+        reply = json.loads(recv_frame(sock))
+    
+    if reply.get("status") != "ok":
+        raise RuntimeError(f"OCR worker error: {reply.get('error')}")
+    return reply["texts"]
+
+def ocr_images(raw_images):
+    """Return the text of each raw image, asking the OCR worker only for uncached ones"""
+    # Batched OCR resizes images, so the same bytes can read differently alone and in a
+    # batch; the path depends only on the upload size and is part of the cache key
+    batched = len(raw_images) > 1
+    keys = [(content_hash(raw), batched) for raw in raw_images]
+    texts = [ocr_cache.get(key) for key in keys]
+    missing = [index for index, text in enumerate(texts) if text is None]
+    
+    if missing:
+        result = request_ocr([raw_images[index] for index in missing], batched)
+        for index, text in zip(missing, result):
+            texts[index] = text
+            if text:
+                ocr_cache.put(keys[index], text)
+    
+    return texts
@@ -0,0 +1,145 @@
+import easyocr
+import cv2
+import numpy as np
+import os
+import hmac
+import json
+import socket
+import secrets
+import logging
+from ocr_client import (
+    OCR_WORKER_ADDRESS, OCR_CONNECT_TIMEOUT, OCR_CHALLENGE_SIZE,
+    ocr_worker_authkey, auth_digest, send_frame, recv_frame
+)
+
+# Logging level is configurable; set LOG_LEVEL=WARNING in production
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Initialize OCR (set USE_GPU=0 on CPU-only deploys)
+USE_GPU = os.getenv("USE_GPU", "1") == "1"
+OCR_DETECT_NETWORK = os.getenv("OCR_DETECT_NETWORK", "dbnet18")
+
+# Batched OCR resizes every image to a common canvas
+OCR_BATCH_WIDTH = 800
+OCR_BATCH_HEIGHT = 600
+OCR_WARMUP_BATCH = 2
+
+reader = None
+
+def load_reader():
+    """Load the EasyOCR model once and warm up the batched path"""
+    global reader
+    reader = easyocr.Reader(
+        ['en'],
+        gpu=USE_GPU,
+        quantize=True,
+        cudnn_benchmark=True,
+        detect_network=OCR_DETECT_NETWORK
+    )
+
+    # Warm up the batched path once so the first request doesn't pay for kernel selection
+    try:
+        reader.readtext_batched(
+            np.zeros([OCR_WARMUP_BATCH, OCR_BATCH_HEIGHT, OCR_BATCH_WIDTH, 3], dtype=np.uint8)
+        )
+        logger.info("✅ OCR reader warmed up")
+    except Exception as e:
+        logger.warning("❌ OCR warmup failed: %s", e)
+
+def decode_image(raw):
+    """Decode uploaded image bytes into a BGR array, or None if unreadable"""
+    return cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+
+def ocr_images(images, batched):
+    """Run EasyOCR over decoded images, in one resized batch if batched, and return the text of each image"""
+    if not batched:
+        # Full-resolution pass; batching a single image only adds the resize cost
+        results_per_image = [reader.readtext(image) for image in images]
+    else:
+        # readtext_batched needs every image on the same canvas
+        batch = np.stack([
+            cv2.resize(image, (OCR_BATCH_WIDTH, OCR_BATCH_HEIGHT)) for image in images
+        ])
+        results_per_image = reader.readtext_batched(
+            batch,
+            n_width=OCR_BATCH_WIDTH,
+            n_height=OCR_BATCH_HEIGHT,
+            batch_size=len(images)
+        )
+    return [" ".join(detection[1] for detection in results) for results in results_per_image]
+
+def ocr_raw_images(raw_images, batched):
+    """Decode and OCR raw image bytes; undecodable images yield empty text"""
+    decoded = [decode_image(raw) for raw in raw_images]
+    readable = [index for index, image in enumerate(decoded) if image is not None]
+
+    texts = [""] * len(raw_images)
+    if readable:
+        for index, text in zip(readable, ocr_images([decoded[index] for index in readable], batched)):
+            texts[index] = text
+
+    skipped = len(raw_images) - len(readable)
+    if skipped:
+        logger.warning("❌ Could not decode %s image(s)", skipped)
+    return texts
+
+def handle_connection(conn, authkey):
+    """Authenticate one web process, run OCR over the images it sends and reply with the texts"""
+    # A silent or slow peer must not stall the worker
+    conn.settimeout(OCR_CONNECT_TIMEOUT)
+
+    challenge = secrets.token_bytes(OCR_CHALLENGE_SIZE)
+    send_frame(conn, challenge)
+    if not hmac.compare_digest(recv_frame(conn, 64), auth_digest(authkey, challenge)):
+        logger.warning("❌ Rejected OCR connection with a bad authkey")
+        return
+
+    header = json.loads(recv_frame(conn))
+    raw_images = [recv_frame(conn) for _ in range(header["count"])]
+
+    try:
+        reply = {"status": "ok", "texts": ocr_raw_images(raw_images, header["batched"])}
+    except Exception as e:
+        logger.error("❌ OCR Error: %s", e)
+        reply = {"status": "error", "error": str(e)}
+    send_frame(conn, json.dumps(reply).encode())
+
+def serve():
+    """Accept OCR requests from the web processes one connection at a time"""
+    # Never listen without a real secret
+    try:
+        authkey = ocr_worker_authkey()
+    except RuntimeError as e:
+        logger.error("❌ OCR worker not started: %s", e)
+        raise SystemExit(1)
+
+    # Bind before loading the model so a second worker exits straight away
+    try:
+        server = socket.create_server(OCR_WORKER_ADDRESS)
+    except OSError as e:
+        logger.warning("❌ OCR worker not started, %s is in use: %s", OCR_WORKER_ADDRESS, e)
+        return
+
+    load_reader()
+    logger.info("✅ OCR worker listening on %s", OCR_WORKER_ADDRESS)
+
+    with server:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError as e:
+                logger.error("❌ OCR worker connection error: %s", e)
+                continue
+
+            with conn:
+                try:
+                    handle_connection(conn, authkey)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    logger.error("❌ OCR worker connection error: %s", e)
+
+if __name__ == '__main__':
+    serve()